@@ -1,59 +1,159 @@
 #!/usr/bin/env python3
-"""Queue a ComfyUI workflow (API-format JSON) and poll until done.
-Prints JSON on success or structured JSON error details on failure.
+"""Queue a ComfyUI workflow (API-format JSON) and wait until done.
+Listens on ComfyUI's /ws event stream when websocket-client is installed,
+otherwise polls /history (over one keep-alive connection when urllib3 is
+installed). Prints JSON on success or structured JSON error
+details on failure.
 """
 import argparse
+import hashlib
+import itertools
 import json
+import os
 import sys
 import time
 import uuid
 import urllib.request
 import urllib.error
 
+try:
+    import orjson  # optional: faster JSON for workflow/history payloads
+except ImportError:
+    orjson = None
 
-def http_json(url, method="GET", payload=None, timeout=30):
+try:
+    import urllib3  # optional: pooled keep-alive connections
+except ImportError:
+    urllib3 = None
+
+try:
+    import websocket  # websocket-client (optional)
+except ImportError:
+    websocket = None
+
+# Stable per-process id: the /prompt client_id must match the /ws clientId so
+# ComfyUI routes this submitter's executing/progress events to our socket.
+CLIENT_ID = uuid.uuid4().hex
+
+# Last observed runtime per workflow shape, used to delay the first /history poll.
+RUNTIMES_PATH = os.path.expanduser("~/.cache/comfyui-skill/runtimes.json")
+
+# Transient gateway/overload statuses retried (GET only, so /prompt is never
+# queued twice) before giving up; other 4xx/5xx fail fast.
+RETRY_STATUSES = (502, 503, 504)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.2
+
+# One persistent connection to the ComfyUI server for /prompt and every /history poll.
+_HTTP = urllib3.PoolManager(
+    num_pools=4,
+    maxsize=4,
+    headers={"Content-Type": "application/json"},
+    retries=urllib3.Retry(
+        total=RETRY_TOTAL,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=RETRY_BACKOFF,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+) if urllib3 else None
+
+
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    _loads = json.loads
+
+
+def http_error(url, status, body, content_type=""):
+    """Print a structured http_error JSON and exit."""
+    detail = None
+    if body and content_type.startswith("application/json"):
+        try:
+            detail = json.loads(body)
+        except ValueError:
+            detail = {"raw": body}
+    elif body:
+        detail = {"raw": body}
+    print(json.dumps({
+        "error": "http_error",
+        "status": status,
+        "url": url,
+        "detail": detail,
+    }))
+    sys.exit(1)
+
+
+def http_json(url, method="GET", payload=None, timeout=30, cache=None):
+    """Request url and return the decoded JSON body.
+    cache is an optional dict kept across calls to the same URL: the last ETag
+    is sent as If-None-Match, and on 304 or a byte-identical body the previously
+    decoded object is returned without parsing again.
+    """
     data = None
     headers = {}
     if payload is not None:
-        data = json.dumps(payload).encode("utf-8")
-        headers["Content-Type"] = "application/json"
-    req = urllib.request.Request(url, data=data, method=method, headers=headers)
-    try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        body = ""
-        try:
-            body = e.read().decode("utf-8", errors="replace")
-        except Exception:
-            pass
-        detail = None
-        if body:
+        data = _dumps(payload)
+    if cache and cache.get("etag"):
+        headers["If-None-Match"] = cache["etag"]
+    if _HTTP is not None:
+        resp = _HTTP.request(
+            method, url, body=data, headers={**_HTTP.headers, **headers},
+            timeout=urllib3.Timeout(connect=2, read=timeout),
+        )
+        if resp.status == 304 and cache:
+            return cache["parsed"]
+        if resp.status >= 400:
+            http_error(
+                url, resp.status, resp.data.decode("utf-8", errors="replace"),
+                resp.headers.get("Content-Type", ""),
+            )
+        body, etag = resp.data, resp.headers.get("ETag")
+    else:
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        for attempt in itertools.count():
+            req = urllib.request.Request(url, data=data, method=method, headers=headers)
             try:
-                detail = json.loads(body)
-            except Exception:
-                detail = {"raw": body}
-        print(json.dumps({
-            "error": "http_error",
-            "status": e.code,
-            "url": url,
-            "detail": detail,
-        }))
-        sys.exit(1)
+                with urllib.request.urlopen(req, timeout=timeout) as resp:
+                    body, etag = resp.read(), resp.headers.get("ETag")
+                break
+            except urllib.error.HTTPError as e:
+                if e.code == 304 and cache:
+                    return cache["parsed"]
+                if method == "GET" and e.code in RETRY_STATUSES and attempt < RETRY_TOTAL:
+                    time.sleep(RETRY_BACKOFF * 2 ** attempt)
+                    continue
+                err_body = ""
+                try:
+                    err_body = e.read().decode("utf-8", errors="replace")
+                except Exception:
+                    pass
+                http_error(url, e.code, err_body, e.headers.get("Content-Type", ""))
+
+    if cache is None:
+        return _loads(body)
+    if cache and body == cache["body"]:
+        return cache["parsed"]
+    parsed = _loads(body)
+    cache.update(body=body, parsed=parsed, etag=etag)
+    return parsed
 
 
 def load_workflow(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return _loads(f.read())
 
 
 def find_output_images(history_obj):
     outputs = history_obj.get("outputs", {})
-    images = []
-    for _node_id, node_out in outputs.items():
-        for img in node_out.get("images", []) or []:
-            images.append(img)
-    return images
+    return list(itertools.chain.from_iterable(
+        node_out.get("images") or () for node_out in outputs.values()
+    ))
 
 
 def extract_error(status_obj):
@@ -72,52 +172,172 @@ def extract_error(status_obj):
     return None
 
 
+def workflow_key(workflow):
+    """Identify a workflow by its graph shape (node ids and class types).
+    Input values are ignored so edited prompts and seeds share one runtime entry.
+    """
+    shape = sorted(
+        (str(node_id), node.get("class_type", ""))
+        for node_id, node in workflow.items()
+        if isinstance(node, dict)
+    )
+    return hashlib.sha256(json.dumps(shape).encode("utf-8")).hexdigest()[:16]
+
+
+def load_runtimes():
+    try:
+        with open(RUNTIMES_PATH, "rb") as f:
+            runtimes = _loads(f.read())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(runtimes, dict):
+        return {}
+    # Drop hand-edited or foreign entries that are not positive durations.
+    return {
+        key: seconds for key, seconds in runtimes.items()
+        if isinstance(seconds, (int, float)) and not isinstance(seconds, bool) and seconds > 0
+    }
+
+
+def save_runtime(key, seconds):
+    """Record the latest runtime for key; failures to write the cache are ignored."""
+    runtimes = load_runtimes()
+    runtimes[key] = round(seconds, 2)
+    tmp_path = RUNTIMES_PATH + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(RUNTIMES_PATH), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(runtimes, f)
+        os.replace(tmp_path, RUNTIMES_PATH)
+    except OSError:
+        pass
+
+
+def open_ws(host, port, client_id, timeout=10):
+    """Connect to ComfyUI's /ws event stream; None if unavailable."""
+    if websocket is None:
+        return None
+    try:
+        return websocket.create_connection(
+            f"ws://{host}:{port}/ws?clientId={client_id}", timeout=timeout
+        )
+    except Exception:
+        return None
+
+
+def wait_ws(ws, prompt_id, deadline):
+    """Block on ws events until prompt_id stops executing.
+    Returns "done", "timeout", or None if the socket broke (caller should poll).
+    """
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return "timeout"
+        ws.settimeout(remaining)
+        try:
+            frame = ws.recv()
+        except websocket.WebSocketTimeoutException:
+            return "timeout"
+        except Exception:
+            return None
+        if not isinstance(frame, str):
+            continue  # binary preview images
+        try:
+            msg = _loads(frame)
+        except ValueError:
+            continue
+        data = msg.get("data") or {}
+        if data.get("prompt_id") != prompt_id:
+            continue
+        # execution_error arrives before the history entry is written; only the
+        # final executing/node=null (sent after it, on success or error) means
+        # /history is ready.
+        if msg.get("type") == "executing" and data.get("node") is None:
+            return "done"
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--host", default="127.0.0.1")
     ap.add_argument("--port", default="8188")
     ap.add_argument("--workflow", required=True, help="Path to API workflow JSON (already edited; script does not modify it)")
     ap.add_argument("--timeout", type=int, default=300, help="Seconds to wait for completion")
-    ap.add_argument("--poll", type=float, default=1.5, help="Seconds between history polls")
+    ap.add_argument("--poll", type=float, default=1.5, help="Seconds between history polls (used when /ws is unavailable)")
+    ap.add_argument("--poll-max", type=float, default=15.0, help="Upper bound for the backed-off poll interval while no progress is seen")
+    ap.add_argument("--expected-duration", type=float, default=None, help="Expected runtime in seconds; polling starts at 70%% of it (default: last recorded runtime of this workflow)")
     args = ap.parse_args()
 
     base = f"http://{args.host}:{args.port}"
     workflow = load_workflow(args.workflow)
+    key = workflow_key(workflow)
+    expected = args.expected_duration
+    if expected is None:
+        expected = load_runtimes().get(key)
 
     payload = {
-        "client_id": str(uuid.uuid4()),
+        "client_id": CLIENT_ID,
         "prompt": workflow,
     }
 
+    # Connect before queueing so no events are missed.
+    ws = open_ws(args.host, args.port, CLIENT_ID)
+
     resp = http_json(f"{base}/prompt", method="POST", payload=payload)
     prompt_id = resp.get("prompt_id")
     if not prompt_id:
         raise SystemExit(f"No prompt_id returned: {resp}")
 
-    deadline = time.time() + args.timeout
+    started = time.time()
+    deadline = started + args.timeout
+    ws_result = None
+    if ws is not None:
+        # On "done" the loop below fetches history once; on a broken socket it polls.
+        try:
+            ws_result = wait_ws(ws, prompt_id, deadline)
+        finally:
+            ws.close()
+
+    if ws_result != "done" and expected:
+        # Nothing to learn from /history until the workflow is nearly done.
+        time.sleep(max(0, min(started + expected * 0.7, deadline) - time.time()))
+
+    # Poll densely, doubling the interval (up to --poll-max) while nothing changes.
+    interval = args.poll
+    last_progress = None
+    history_cache = {}
     while time.time() < deadline:
-        hist = http_json(f"{base}/history/{prompt_id}")
+        hist = http_json(f"{base}/history/{prompt_id}", cache=history_cache)
         item = hist.get(prompt_id)
+        progress = None
         if item:
             status = item.get("status", {})
-            status_str = status.get("status_str")
-
-            if status.get("completed") and status_str != "error":
-                images = find_output_images(item)
-                print(json.dumps({"prompt_id": prompt_id, "images": images}))
-                return
-
-            if status_str == "error":
-                err = extract_error(status) or {}
-                print(json.dumps({
-                    "prompt_id": prompt_id,
-                    "error": "execution_error",
-                    "status": status_str,
-                    "detail": err,
-                }))
-                sys.exit(1)
-
-        time.sleep(args.poll)
+            progress = (status.get("completed"), status.get("status_str"), len(item.get("outputs", {})))
+        if progress == last_progress:
+            # Same state as the last poll: nothing to re-scan, just back off.
+            interval = min(interval * 2, max(args.poll, args.poll_max))
+        else:
+            interval = args.poll
+            last_progress = progress
+            if item:
+                completed, status_str, _outputs_len = progress
+
+                if completed and status_str != "error":
+                    images = find_output_images(item)
+                    save_runtime(key, time.time() - started)
+                    print(json.dumps({"prompt_id": prompt_id, "images": images}))
+                    return
+
+                if status_str == "error":
+                    err = extract_error(status) or {}
+                    print(json.dumps({
+                        "prompt_id": prompt_id,
+                        "error": "execution_error",
+                        "status": status_str,
+                        "detail": err,
+                    }))
+                    sys.exit(1)
+
+        time.sleep(max(0, min(interval, deadline - time.time())))
 
     print(json.dumps({
         "prompt_id": prompt_id,
@@ -2,26 +2,72 @@
 """
 Download model weight URLs into a ComfyUI installation's models folder.
 Uses pget (https://github.com/replicate/pget) when available for parallel downloads;
-installs pget to ~/.local/bin if missing. Falls back to Python urllib if pget
-cannot be used. Reads URLs from arguments or stdin (one per line; optional
+installs pget to ~/.local/bin if missing. Falls back to concurrent Python
+downloads if pget cannot be used (asyncio + httpx, else threads over urllib3
+or urllib, whichever is installed; large files are fetched as parallel byte
+ranges). Reads URLs from arguments or stdin (one per line; optional
 "url subfolder" per line).
 """
 import argparse
+import asyncio
+import contextlib
+import functools
+import hashlib
+import importlib.util
 import os
 import platform
 import re
+import select
 import shutil
+import ssl
 import subprocess
 import sys
 import tempfile
+import threading
+import urllib.error
 import urllib.request
-from urllib.parse import unquote, urlparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urljoin, urlparse
+
+try:
+    import httpx  # optional: asyncio downloads for the built-in downloader
+except ImportError:
+    httpx = None
+
+try:
+    import urllib3  # optional: pooled connections for the built-in downloader
+except ImportError:
+    urllib3 = None
+
+try:
+    import fcntl  # Unix only; used to enlarge the splice pipe
+except ImportError:
+    fcntl = None
 
 PGET_RELEASE = "https://github.com/replicate/pget/releases/latest/download"
+USER_AGENT = "ComfyUI-Skill/1.0"
+
+# Concurrent downloads for the built-in (non-pget) path: files in parallel,
+# and each large file split into byte ranges fetched over several streams.
+FALLBACK_WORKERS = 8
+RANGE_STREAMS = 4
+RANGE_CHUNK = 8 << 20
+COPY_BUFSIZE = 8 << 20
+# Plain-HTTP bodies from local mirrors (or large ones from anywhere) are moved
+# socket -> pipe -> file with os.splice (Linux) instead of through Python.
+SPLICE_HOSTS = frozenset({"127.0.0.1", "localhost", "::1"})
+SPLICE_MIN_SIZE = 100 << 20
+SPLICE_PIPE_SIZE = 1 << 20
+# httpx path: connections per host for whole-file GETs; HTTP/2 needs the h2 package.
+HOST_CONNECTIONS = 4
+HAS_H2 = httpx is not None and importlib.util.find_spec("h2") is not None
+_HTTP = urllib3.PoolManager(
+    maxsize=FALLBACK_WORKERS * RANGE_STREAMS, headers={"User-Agent": USER_AGENT}
+) if urllib3 else None
 
 
 # ComfyUI models subfolders (under ComfyUI/models/)
-SUBFOLDERS = {
+SUBFOLDERS = frozenset({
     "checkpoints",
     "clip",
     "clip_vision",
@@ -37,7 +83,7 @@ SUBFOLDERS = {
     "hypernetworks",
     "photomaker",
     "style_models",
-}
+})
 
 # Heuristics: filename fragment -> subfolder (lowercase match)
 SUBFOLDER_HINTS = [
@@ -52,15 +98,34 @@ SUBFOLDER_HINTS = [
     (r"\b(diffusion)\b", "diffusion_models"),
 ]
 
+# Hints precompiled once and tried in list order (first hint that matches wins).
+_HINT_RES = [(re.compile(p, re.IGNORECASE), sub) for p, sub in SUBFOLDER_HINTS]
+
 
 def infer_subfolder(url_or_filename: str) -> str:
-    s = (url_or_filename or "").lower()
-    for pattern, subfolder in SUBFOLDER_HINTS:
-        if re.search(pattern, s):
+    s = url_or_filename or ""
+    for pattern, subfolder in _HINT_RES:
+        if pattern.search(s):
             return subfolder
     return "checkpoints"
 
 
+def _pget_checksum(asset: str) -> str | None:
+    """Return the published sha256 for a pget release asset, or None if unavailable."""
+    req = urllib.request.Request(f"{PGET_RELEASE}/checksums.txt", headers={"User-Agent": USER_AGENT})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            text = resp.read().decode("utf-8", errors="replace")
+    except Exception:
+        return None
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1].lstrip("*") == asset:
+            return parts[0].lower()
+    return None
+
+
+@functools.lru_cache(maxsize=None)
 def get_pget_binary() -> str | None:
     """Return path to pget binary, or None if not found and install failed."""
     pget = shutil.which("pget")
@@ -81,36 +146,60 @@ def get_pget_binary() -> str | None:
     # Replicate releases: pget_Linux_x86_64, pget_Darwin_arm64, etc.
     asset = f"pget_{sysname}_{machine}"
     url = f"{PGET_RELEASE}/{asset}"
+    # Stream to a temp file and rename into place, so an interrupted install
+    # never leaves a truncated executable at pget_path.
+    tmp_path = pget_path + ".tmp"
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "ComfyUI-Skill/1.0"})
+        digest = hashlib.sha256()
+        req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
         with urllib.request.urlopen(req, timeout=60) as resp:
-            with open(pget_path, "wb") as f:
-                f.write(resp.read())
-        os.chmod(pget_path, 0o755)
+            with open(tmp_path, "wb") as f:
+                for chunk in iter(lambda: resp.read(1 << 20), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        expected = _pget_checksum(asset)
+        if expected is None:
+            print("pget checksums.txt unavailable; installing unverified binary.", file=sys.stderr)
+        elif digest.hexdigest() != expected:
+            raise ValueError(f"sha256 mismatch for {asset}")
+        os.chmod(tmp_path, 0o755)
+        os.replace(tmp_path, pget_path)
         return pget_path
     except Exception as e:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
         print(f"Could not install pget ({e}); falling back to built-in download.", file=sys.stderr)
         return None
 
 
+def model_dirs(base: str) -> dict[str, str]:
+    """Map every subfolder to its directory under base/models."""
+    models = os.path.join(base, "models")
+    return {sub: os.path.join(models, sub) for sub in SUBFOLDERS}
+
+
 def resolve_url_dest(
-    raw: str, base: str, overwrite: bool, default_subfolder: str | None
+    raw: str, target_dirs: dict[str, str], overwrite: bool, default_subfolder: str | None
 ) -> tuple[str | None, str | None, bool]:
-    """Return (url, dest_path, is_skip). url None = skip/ignore."""
+    """Return (url, dest_path, is_skip). url None = skip/ignore.
+    target_dirs maps each subfolder to its models/ directory (see model_dirs);
+    default_subfolder must be a SUBFOLDERS member or None. The destination
+    directory is not created.
+    """
     url = raw.strip()
     if not url or url.startswith("#"):
         return (None, None, True)
-    subfolder = default_subfolder if default_subfolder in SUBFOLDERS else "checkpoints"
+    subfolder = default_subfolder or "checkpoints"
     if " " in url:
-        url, sub = url.strip().split(None, 1)
-        sub = sub.strip().lower()
+        url, sub = url.split(None, 1)
+        sub = sub.lower()
         if sub in SUBFOLDERS:
             subfolder = sub
-    elif not default_subfolder or default_subfolder not in SUBFOLDERS:
+    elif not default_subfolder:
         subfolder = infer_subfolder(url)
-    base = os.path.expanduser(base)
-    model_dir = os.path.join(base, "models", subfolder)
-    os.makedirs(model_dir, exist_ok=True)
+    model_dir = target_dirs[subfolder]
     path = urlparse(url).path
     name = path.rstrip("/").split("/")[-1]
     name = unquote(name) if name else "downloaded.safetensors"
@@ -120,34 +209,415 @@ def resolve_url_dest(
     return (url, out_path, False)
 
 
-def download_with_pget(manifest_path: str, pget_bin: str, overwrite: bool) -> bool:
+def download_with_pget(
+    manifest_path: str, pget_bin: str, overwrite: bool, concurrency: int | None = None
+) -> bool:
     cmd = [pget_bin, "multifile", manifest_path]
     if overwrite:
         cmd.append("-f")
+    if concurrency:
+        cmd += ["--max-concurrent-files", str(concurrency)]
     r = subprocess.run(cmd)
     return r.returncode == 0
 
 
+def _open(url: str, headers: dict | None = None):
+    """GET url via the shared pool (or urllib); returns an unread response."""
+    if _HTTP is not None:
+        return _HTTP.request(
+            "GET", url, headers={**_HTTP.headers, **(headers or {})}, preload_content=False,
+            timeout=urllib3.Timeout(connect=30, read=600),
+        )
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, **(headers or {})})
+    try:
+        return urllib.request.urlopen(req, timeout=600)
+    except urllib.error.HTTPError as e:
+        return e
+
+
+def _release(resp) -> None:
+    """Return a fully read urllib3 connection to the pool, or close a urllib response."""
+    if hasattr(resp, "release_conn"):
+        resp.release_conn()
+    else:
+        resp.close()
+
+
+def _final_url(url: str, resp) -> str:
+    """URL that actually served resp, with any redirects followed."""
+    history = getattr(getattr(resp, "retries", None), "history", None)
+    if history is None:
+        return resp.geturl() or url  # urllib: already absolute
+    # urllib3 keeps each raw (possibly relative) Location in the retry history.
+    for hop in history:
+        if hop.redirect_location:
+            url = urljoin(url, hop.redirect_location)
+    return url
+
+
+def _probe_range_size(url: str) -> tuple[int, str] | None:
+    """Return (total size, final URL after redirects) if the server honours
+    byte ranges for url, else None. Ranges are then requested from the final
+    URL so each one skips the redirect (e.g. HuggingFace resolve/ -> CDN).
+    """
+    resp = _open(url, {"Range": "bytes=0-0"})
+    if resp.status != 206:
+        resp.close()
+        return None
+    m = re.fullmatch(r"bytes 0-0/(\d+)", resp.headers.get("Content-Range", ""))
+    final_url = _final_url(url, resp)
+    resp.read()
+    _release(resp)
+    return (int(m.group(1)), final_url) if m else None
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int) -> int:
+    """Write all of data at offset; returns the offset just past it."""
+    view = memoryview(data)
+    while view:
+        n = os.pwrite(fd, view, offset)
+        view = view[n:]
+        offset += n
+    return offset
+
+
+def _create_part(part_path: str, size: int) -> int:
+    """Open part_path for writing, preallocated to size bytes; returns the fd."""
+    fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        os.ftruncate(fd, size)
+    return fd
+
+
+def _fetch_range(url: str, fd: int, start: int, end: int) -> None:
+    resp = _open(url, {"Range": f"bytes={start}-{end}"})
+    offset = start
+    try:
+        if resp.status != 206:
+            raise OSError(f"HTTP {resp.status} for range {start}-{end} of {url}")
+        while True:
+            chunk = resp.read(1 << 20)
+            if not chunk:
+                break
+            offset = _pwrite_all(fd, chunk, offset)
+    except BaseException:
+        resp.close()
+        raise
+    _release(resp)
+    if offset != end + 1:
+        raise OSError(f"Short read for range {start}-{end} of {url}")
+
+
+def download_one_ranged(
+    url: str, dest_path: str, n_streams: int = RANGE_STREAMS, chunk: int = RANGE_CHUNK
+) -> bool:
+    """Download url as parallel byte ranges written in place with pwrite.
+    Returns False (nothing written) if the server does not support ranges or
+    the file is too small to be worth splitting; raises on download errors.
+    """
+    if not hasattr(os, "pwrite"):
+        return False
+    probe = _probe_range_size(url)
+    if probe is None or probe[0] < 2 * chunk:
+        return False
+    size, range_url = probe
+    part_path = dest_path + ".part"
+    fd = _create_part(part_path, size)
+    try:
+        ranges = [(a, min(a + chunk, size) - 1) for a in range(0, size, chunk)]
+        with ThreadPoolExecutor(max_workers=n_streams) as ex:
+            futures = [ex.submit(_fetch_range, range_url, fd, a, b) for a, b in ranges]
+            try:
+                for fut in futures:
+                    fut.result()
+            except BaseException:
+                # Drop queued ranges; leaving the with block waits for the
+                # in-flight ones, so nothing writes to fd after it is closed.
+                ex.shutdown(cancel_futures=True)
+                raise
+    except BaseException:
+        os.close(fd)
+        os.unlink(part_path)
+        raise
+    os.close(fd)
+    os.replace(part_path, dest_path)
+    return True
+
+
+def _spliceable(url: str, resp):
+    """Return (buffered_fp, socket, length) if resp's body can be spliced, else None.
+    Requires os.splice, a plain (non-TLS) socket, a Content-Length and an
+    unencoded, unchunked body.
+    """
+    if not hasattr(os, "splice"):
+        return None
+    headers = resp.headers
+    if headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    if "chunked" in headers.get("Transfer-Encoding", "").lower():
+        return None
+    try:
+        length = int(headers.get("Content-Length", ""))
+    except ValueError:
+        return None
+    if urlparse(url).hostname not in SPLICE_HOSTS and length < SPLICE_MIN_SIZE:
+        return None
+    # urllib3 wraps an http.client response in ._fp; urllib returns one directly.
+    fp = getattr(getattr(resp, "_fp", resp), "fp", None)
+    sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    if sock is None or isinstance(sock, ssl.SSLSocket):
+        return None
+    return fp, sock, length
+
+
+def _splice_body(fp, sock, length: int, f) -> None:
+    """Copy length body bytes from sock into file f without a user-space copy."""
+    # http.client may already hold the start of the body in its buffer.
+    head = fp.read1(length) if length else b""
+    f.write(head)
+    f.flush()
+    remaining = length - len(head)
+    sock_fd, out_fd, timeout = sock.fileno(), f.fileno(), sock.gettimeout()
+    r, w = os.pipe()
+    try:
+        if fcntl is not None and hasattr(fcntl, "F_SETPIPE_SZ"):
+            with contextlib.suppress(OSError):
+                fcntl.fcntl(w, fcntl.F_SETPIPE_SZ, SPLICE_PIPE_SIZE)
+        while remaining:
+            try:
+                n = os.splice(sock_fd, w, min(remaining, SPLICE_PIPE_SIZE))
+            except BlockingIOError:
+                # Sockets with a timeout are non-blocking at the OS level.
+                if not select.select([sock_fd], [], [], timeout)[0]:
+                    raise TimeoutError("timed out reading response body")
+                continue
+            if n == 0:
+                raise OSError(f"Connection closed with {remaining} bytes left")
+            remaining -= n
+            while n:
+                n -= os.splice(r, out_fd, n)
+    finally:
+        os.close(r)
+        os.close(w)
+
+
 def download_one_fallback(
     url: str, dest_path: str, overwrite: bool
 ) -> tuple[str, str]:
-    """Download one file with urllib. Returns (status, path_or_message)."""
+    """Download one file with urllib3 (or urllib). Returns (status, path_or_message)."""
     if os.path.isfile(dest_path) and not overwrite:
         return ("skipped", dest_path)
-    req = urllib.request.Request(url, headers={"User-Agent": "ComfyUI-Skill/1.0"})
     try:
-        with urllib.request.urlopen(req, timeout=600) as resp:
+        if download_one_ranged(url, dest_path):
+            return ("ok", dest_path)
+        resp = _open(url)
+        if resp.status >= 400:
+            resp.close()
+            return ("error", f"HTTP {resp.status} for {url}")
+        splice = _spliceable(url, resp)
+        try:
             with open(dest_path, "wb") as f:
-                while True:
-                    chunk = resp.read(1 << 20)
-                    if not chunk:
-                        break
-                    f.write(chunk)
+                if splice:
+                    _splice_body(*splice, f)
+                else:
+                    shutil.copyfileobj(resp, f, length=COPY_BUFSIZE)
+        except BaseException:
+            resp.close()
+            raise
+        if splice:
+            # The body bypassed the client's own reader, so the connection
+            # cannot be handed back to the pool.
+            resp.close()
+        else:
+            _release(resp)
         return ("ok", dest_path)
     except Exception as e:
         return ("error", str(e))
 
 
+async def _probe_range_size_async(client, url: str) -> tuple[int, str] | None:
+    async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as r:
+        if r.status_code != 206:
+            return None
+        m = re.fullmatch(r"bytes 0-0/(\d+)", r.headers.get("Content-Range", ""))
+        await r.aread()
+    return (int(m.group(1)), str(r.url)) if m else None
+
+
+async def _fetch_range_async(client, url: str, fd: int, start: int, end: int, sem) -> None:
+    async with sem:
+        offset = start
+        async with client.stream("GET", url, headers={"Range": f"bytes={start}-{end}"}) as r:
+            if r.status_code != 206:
+                raise OSError(f"HTTP {r.status_code} for range {start}-{end} of {url}")
+            async for chunk in r.aiter_raw(1 << 20):
+                # Written inline (a page-cache write), not via to_thread: a
+                # cancelled to_thread task returns while its thread may still be
+                # writing, which could outlive fd.
+                offset = _pwrite_all(fd, chunk, offset)
+    if offset != end + 1:
+        raise OSError(f"Short read for range {start}-{end} of {url}")
+
+
+async def download_one_async(
+    client, range_client, url: str, dest_path: str, overwrite: bool
+) -> tuple[str, str]:
+    """Async counterpart of download_one_fallback using httpx.AsyncClients.
+    client (per host, HTTP/2 when available) serves the probe and whole-file
+    GETs; range_client (HTTP/1.1) serves byte ranges, one connection each.
+    """
+    if os.path.isfile(dest_path) and not overwrite:
+        return ("skipped", dest_path)
+    try:
+        probe = await _probe_range_size_async(client, url) if hasattr(os, "pwrite") else None
+        if probe is not None and probe[0] >= 2 * RANGE_CHUNK:
+            size, range_url = probe
+            part_path = dest_path + ".part"
+            fd = _create_part(part_path, size)
+            sem = asyncio.Semaphore(RANGE_STREAMS)
+            tasks = [
+                asyncio.create_task(_fetch_range_async(
+                    range_client, range_url, fd, a, min(a + RANGE_CHUNK, size) - 1, sem
+                ))
+                for a in range(0, size, RANGE_CHUNK)
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # gather() does not stop the other ranges; cancel and wait for
+                # all of them. pwrite runs inline in each task, so once they
+                # have all finished nothing can still write to fd.
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                os.close(fd)
+                os.unlink(part_path)
+                raise
+            os.close(fd)
+            os.replace(part_path, dest_path)
+            return ("ok", dest_path)
+        async with client.stream("GET", url) as r:
+            if r.status_code >= 400:
+                return ("error", f"HTTP {r.status_code} for {url}")
+            with open(dest_path, "wb") as f:
+                async for chunk in r.aiter_bytes(1 << 20):
+                    await asyncio.to_thread(f.write, chunk)
+        return ("ok", dest_path)
+    except Exception as e:
+        return ("error", str(e))
+
+
+def _async_client(max_connections: int, http2: bool = False):
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        ),
+        http2=http2,
+        timeout=httpx.Timeout(600, connect=30),
+        follow_redirects=True,
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+async def _download_all_async(entries, overwrite: bool, report) -> None:
+    # One HTTP/2 client per host so all files from e.g. huggingface.co share a
+    # multiplexed TLS connection. Ranges of large files go over a separate
+    # HTTP/1.1 client: multiplexing them onto one TCP stream would undo the
+    # point of splitting the transfer.
+    async with contextlib.AsyncExitStack() as stack:
+        range_client = await stack.enter_async_context(
+            _async_client(FALLBACK_WORKERS * RANGE_STREAMS)
+        )
+        host_clients = {}
+        sem = asyncio.Semaphore(FALLBACK_WORKERS)
+
+        async def one(client, url, dest_path):
+            async with sem:
+                report(*await download_one_async(client, range_client, url, dest_path, overwrite))
+
+        # entries may block (piped stdin), so pull each one in a thread and
+        # start its download right away while the rest are still being read.
+        it = iter(entries)
+        tasks = []
+        while (entry := await asyncio.to_thread(next, it, None)) is not None:
+            url, dest_path = entry
+            netloc = urlparse(url).netloc
+            if netloc not in host_clients:
+                host_clients[netloc] = await stack.enter_async_context(
+                    _async_client(HOST_CONNECTIONS, http2=HAS_H2)
+                )
+            tasks.append(asyncio.create_task(one(host_clients[netloc], url, dest_path)))
+        await asyncio.gather(*tasks)
+
+
+def download_all_fallback(entries, overwrite: bool, report) -> None:
+    """Download entries concurrently, calling report(status, path_or_message) as each finishes.
+    entries may be a lazy iterable; each download starts as soon as it is yielded.
+    Uses asyncio + httpx when installed, otherwise a thread pool over download_one_fallback.
+    """
+    if httpx is not None:
+        asyncio.run(_download_all_async(entries, overwrite, report))
+        return
+    with ThreadPoolExecutor(max_workers=FALLBACK_WORKERS) as ex:
+        for url, dest_path in entries:
+            fut = ex.submit(download_one_fallback, url, dest_path, overwrite)
+            fut.add_done_callback(lambda f: report(*f.result()))
+
+
+def download_all_pget(entries: list, pget_bin: str, args: argparse.Namespace, report) -> bool:
+    """Download entries in a single pget multifile run; returns False if pget failed."""
+    fd, manifest_path = tempfile.mkstemp(suffix=".txt")
+    with open(fd, "w", buffering=1 << 16) as f:
+        f.writelines(f"{url} {dest}\n" for url, dest in entries)
+    concurrency = args.pget_concurrency or min(FALLBACK_WORKERS, len(entries))
+    try:
+        if download_with_pget(manifest_path, pget_bin, args.overwrite, concurrency):
+            for _url, dest in entries:
+                report("ok", dest)
+            return True
+    except Exception as e:
+        print(f"pget failed ({e}); falling back to built-in download.", file=sys.stderr)
+    finally:
+        os.unlink(manifest_path)
+    return False
+
+
+_REPORT_LOCK = threading.Lock()
+
+
+def _report(counts: dict, status: str, path_or_msg: str) -> None:
+    # Called from download threads and the stdin reader, so serialize.
+    with _REPORT_LOCK:
+        counts[status] += 1
+        if status == "ok":
+            print(path_or_msg)
+        elif status == "skipped":
+            print(f"skipped {path_or_msg}")
+        else:
+            print(f"error {path_or_msg}", file=sys.stderr)
+
+
+def iter_entries(lines, target_dirs: dict[str, str], default_sub: str | None, overwrite: bool, report):
+    """Lazily resolve raw URL lines to (url, dest_path) entries to download.
+    Files already on disk are reported as skipped; each target folder is
+    created once, the first time an entry needs it.
+    """
+    made_dirs = set()
+    for raw in lines:
+        url, dest, is_skip = resolve_url_dest(raw, target_dirs, overwrite, default_sub)
+        if url is None:
+            if is_skip and dest:
+                report("skipped", dest)
+            continue
+        model_dir = os.path.dirname(dest)
+        if model_dir not in made_dirs:
+            os.makedirs(model_dir, exist_ok=True)
+            made_dirs.add(model_dir)
+        yield (url, dest)
+
+
 def main():
     ap = argparse.ArgumentParser(
         description="Download model weight URLs into ComfyUI models folder (uses pget when available)."
@@ -177,6 +647,12 @@ def main():
         action="store_true",
         help="Do not use or install pget; use built-in download only",
     )
+    ap.add_argument(
+        "--pget-concurrency",
+        type=int,
+        default=None,
+        help=f"Files pget downloads at once (default: min({FALLBACK_WORKERS}, number of URLs))",
+    )
     args = ap.parse_args()
 
     base = os.path.expanduser(args.base)
@@ -184,69 +660,25 @@ def main():
         print(f"Error: ComfyUI base not found: {base}", file=sys.stderr)
         sys.exit(1)
 
-    urls = list(args.urls)
-    if not urls:
-        for line in sys.stdin:
-            urls.append(line.strip())
-
-    default_sub = args.subfolder
-    entries = []
-    skipped_paths = []
-    for raw in urls:
-        url, dest, is_skip = resolve_url_dest(raw, base, args.overwrite, default_sub)
-        if url is None and is_skip and dest:
-            skipped_paths.append(dest)
-            continue
-        if url is None:
-            continue
-        entries.append((url, dest))
+    default_sub = args.subfolder if args.subfolder in SUBFOLDERS else None
+    target_dirs = model_dirs(base)
+    counts = {"ok": 0, "skipped": 0, "error": 0}
+    report = functools.partial(_report, counts)
+    # stdin is consumed lazily, so piped URLs start downloading before EOF.
+    entries = iter_entries(args.urls or sys.stdin, target_dirs, default_sub, args.overwrite, report)
 
-    if not entries:
-        for p in skipped_paths:
-            print(f"skipped {p}")
-        print("Done: 0 downloaded,", len(skipped_paths), "skipped.", file=sys.stderr)
-        return
-
-    use_pget = not args.no_pget
-    pget_bin = get_pget_binary() if use_pget else None
+    pget_bin = None if args.no_pget else get_pget_binary()
+    if pget_bin:
+        # pget reads its whole manifest up front: collect every entry, then
+        # download them all in one run.
+        entries = list(entries)
+        if entries and download_all_pget(entries, pget_bin, args, report):
+            entries = []
+    download_all_fallback(entries, args.overwrite, report)
 
-    if pget_bin and entries:
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False) as f:
-            for url, dest in entries:
-                f.write(url + " " + dest + "\n")
-            manifest_path = f.name
-        try:
-            if download_with_pget(manifest_path, pget_bin, args.overwrite):
-                for _url, dest in entries:
-                    print(dest)
-                print(f"Done: {len(entries)} downloaded (pget).", file=sys.stderr)
-            else:
-                use_pget = False
-        except Exception as e:
-            print(f"pget failed ({e}); falling back to built-in download.", file=sys.stderr)
-            use_pget = False
-        finally:
-            os.unlink(manifest_path)
-
-    if not use_pget or not (pget_bin and entries):
-        ok, skipped, err = 0, 0, 0
-        for url, dest_path in entries:
-            status, path_or_msg = download_one_fallback(url, dest_path, args.overwrite)
-            if status == "ok":
-                print(dest_path)
-                ok += 1
-            elif status == "skipped":
-                print(f"skipped {path_or_msg}")
-                skipped += 1
-            else:
-                print(f"error {path_or_msg}", file=sys.stderr)
-                err += 1
-        for p in skipped_paths:
-            print(f"skipped {p}")
-            skipped += 1
-        if err:
-            sys.exit(1)
-        print(f"Done: {ok} downloaded, {skipped} skipped.", file=sys.stderr)
+    if counts["error"]:
+        sys.exit(1)
+    print(f"Done: {counts['ok']} downloaded, {counts['skipped']} skipped.", file=sys.stderr)
 
 
 if __name__ == "__main__":